@@ -1,8 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-from work1 import Lexer, Token
+from work1 import Lexer, Token, TokenType as LexTokenType
 from work2 import LR1Parser ,TokenType
 import os
+import queue
+import threading
+
+
+# 按名称查找语法分析器的TokenType，比TokenType[name]更快
+PARSE_TYPE_BY_NAME = {t.name: t for t in TokenType}
+# 词法分析器与语法分析器各自定义了TokenType，按名称对应
+LEX_TO_PARSE_TYPE = {t: PARSE_TYPE_BY_NAME[t.name] for t in LexTokenType}
 
 
 class CompilerGUI:
@@ -30,95 +38,155 @@ class CompilerGUI:
         self.result_text = scrolledtext.ScrolledText(main_frame, width=60, height=15)
         self.result_text.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E))
 
+        self._last_tokens = None  # 最近一次词法分析得到的token，供语法分析直接使用
+        self.save_lexer_output = True  # 是否将词法分析结果保存到 lexer_output.txt
+        self._result_queue = queue.Queue()  # 后台分析线程产生、等待显示的文本
+        self._worker = None  # 正在运行的后台分析线程
+
     def save_source_code(self):
         """保存源代码到临时文件"""
         with open('source.c', 'w', encoding='utf-8') as f:
             f.write(self.source_code.get('1.0', tk.END))
 
+    def _start_worker(self, target):
+        """在后台线程中运行分析，界面线程定时从队列取出结果显示"""
+        self._worker = threading.Thread(target=target, daemon=True)
+        self._worker.start()
+        self.root.after(50, self._drain_queue)
+
+    def _worker_running(self):
+        """是否有后台分析线程正在运行"""
+        return self._worker is not None and self._worker.is_alive()
+
+    def _drain_queue(self):
+        """取出队列中积累的全部文本，合并为一次插入"""
+        chunks = []
+        try:
+            while True:
+                chunks.append(self._result_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if chunks:
+            self.result_text.insert(tk.END, ''.join(chunks))
+        if self._worker_running() or not self._result_queue.empty():
+            self.root.after(50, self._drain_queue)
+
     def perform_lexical_analysis(self):
         """执行词法分析"""
+        if self._worker_running():
+            return
         self.result_text.delete('1.0', tk.END)
         self.save_source_code()
 
-        lexer = Lexer("grammar1.txt")
-        tokens = lexer.tokenize_file("source.c")
-
-
-        # 显示词法分析结果
         self.result_text.insert(tk.END, "词法分析结果：\n\n")
-        for token in tokens:
-            self.result_text.insert(tk.END, f"{str(token)}\n")
+        self._start_worker(self._run_lexical_analysis)
 
-        # 保存词法分析结果
-        with open("lexer_output.txt", "w", encoding="utf-8") as f:
-            for token in tokens:
-                f.write(f"({token.line}, {token.type}, '{token.value}')\n")
+    def _run_lexical_analysis(self):
+        """后台线程：词法分析并把结果分批放入队列"""
+        try:
+            lexer = Lexer("grammar1.txt")
+            tokens = lexer.tokenize_file("source.c")
+
+            # 每1000个token合成一段文本，界面线程取出后一次性插入
+            for start in range(0, len(tokens), 1000):
+                self._result_queue.put(''.join(f"{str(token)}\n" for token in tokens[start:start + 1000]))
+
+            # 与 load_lexer_output 读文件时一样去掉值两端的引号和空格，两条路径得到相同的token
+            self._last_tokens = [(t.line, LEX_TO_PARSE_TYPE[t.type], t.value.strip(' "\''))
+                                 for t in tokens]
+
+            # 保存词法分析结果
+            if self.save_lexer_output:
+                with open("lexer_output.txt", "w", encoding="utf-8", buffering=1 << 20) as f:
+                    f.writelines(f"({token.line}, {token.type}, '{token.value}')\n" for token in tokens)
+        except SystemExit:
+            # 文法文件缺失时 GrammarParser 会调用 sys.exit，这里拦下，避免后台线程无提示地结束
+            self._result_queue.put("文法文件 grammar1.txt 未找到\n")
+        except Exception as e:
+            self._result_queue.put(f"分析过程中出现错误：{str(e)}\n")
+
+    def load_lexer_output(self):
+        """读取词法分析结果文件并解析tokens"""
+        tokens = []
+        with open('lexer_output.txt', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        # 解析token字符串
+                        tuple_str = line.strip()[1:-1]  # 移除括号
+                        parts = [p.strip() for p in tuple_str.split(',', 2)]
+
+                        # 创建token元组
+                        line_no = int(parts[0])
+                        token_type = PARSE_TYPE_BY_NAME[parts[1].rpartition('.')[2]]
+                        value = parts[2].strip(' "\'')
+
+                        tokens.append((line_no, token_type, value))
+                    except (ValueError, KeyError) as e:
+                        self._result_queue.put(f"解析token出错: {line.strip()}\n")
+                        self._result_queue.put(f"错误详情: {str(e)}\n")
+                        continue
+        return tokens
 
     def perform_syntax_analysis(self):
         """执行语法分析"""
+        if self._worker_running():
+            return
         self.result_text.delete('1.0', tk.END)
 
         # 确保先进行词法分析
-        if not os.path.exists('lexer_output.txt'):
+        if self._last_tokens is None and not os.path.exists('lexer_output.txt'):
             self.result_text.insert(tk.END, "请先进行词法分析！\n")
             return
 
-        # 读取词法分析结果并解析tokens
-        tokens = []
+        self._start_worker(self._run_syntax_analysis)
+
+    def _run_syntax_analysis(self):
+        """后台线程：语法分析并把结果放入队列"""
         try:
-            with open('lexer_output.txt', 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        try:
-                            # 解析token字符串
-                            tuple_str = line.strip()[1:-1]  # 移除括号
-                            parts = [p.strip() for p in tuple_str.split(',', 2)]
-
-                            # 创建token元组
-                            line_no = int(parts[0])
-                            token_type = TokenType[parts[1].split('.')[-1].strip()]
-                            value = parts[2].strip(' "\'')
-
-                            tokens.append((line_no, token_type, value))
-                        except (ValueError, KeyError) as e:
-                            self.result_text.insert(tk.END, f"解析token出错: {line.strip()}\n")
-                            self.result_text.insert(tk.END, f"错误详情: {str(e)}\n")
-                            continue
+            # 优先使用缓存的token，否则读取词法分析结果文件
+            if self._last_tokens is not None:
+                tokens = self._last_tokens
+            else:
+                tokens = self.load_lexer_output()
 
             # 创建并运行语法分析器
             parser = LR1Parser('grammar2.txt')
+            parser.dump()  # 写出状态集和分析表文件，成功时显示其中的 parsing_process.txt
 
             success, errors = parser.parse(tokens)
 
             # 显示分析结果
-            # self.result_text.insert(tk.END, "语法分析结果：\n\n")
+            # self._result_queue.put("语法分析结果：\n\n")
             if success:
-                self.result_text.insert(tk.END, "语法分析成功！\n")
+                self._result_queue.put("语法分析成功！\n")
                 # 显示生成的分析表和状态
                 try:
                     # with open('states.txt', 'r', encoding='utf-8') as f:
-                    #     self.result_text.insert(tk.END, "\n状态集：\n" + f.read())
+                    #     self._result_queue.put("\n状态集：\n" + f.read())
                     # with open('parsing_tables.txt', 'r', encoding='utf-8') as f:
-                    #     self.result_text.insert(tk.END, "\n分析表：\n" + f.read())
+                    #     self._result_queue.put("\n分析表：\n" + f.read())
                     with open('parsing_process.txt', 'r', encoding='utf-8') as f:
-                        self.result_text.insert(tk.END, "\n语法处理分析过程：\n" + f.read())
+                        self._result_queue.put("\n语法处理分析过程：\n" + f.read())
                 except FileNotFoundError:
                     pass
             else:
-                self.result_text.insert(tk.END, "语法分析失败！\n")
+                self._result_queue.put("语法分析失败！\n")
                 for error in errors:
-                    self.result_text.insert(tk.END, f"{error}\n")
+                    self._result_queue.put(f"{error}\n")
 
                 # 保存错误信息到文件
                 with open('syntax_errors.txt', 'w', encoding='utf-8') as f:
                     f.write("编译错误：\n\n")
-                    for error in errors:
-                        f.write(error + '\n')
+                    f.writelines(error + '\n' for error in errors)
 
         except FileNotFoundError:
-            self.result_text.insert(tk.END, "找不到词法分析输出文件 lexer_output.txt\n")
+            self._result_queue.put("找不到词法分析输出文件 lexer_output.txt\n")
+        except SystemExit:
+            # 文法文件缺失时 Grammar 会调用 sys.exit，这里拦下，避免后台线程无提示地结束
+            self._result_queue.put("文法文件 grammar2.txt 未找到\n")
         except Exception as e:
-            self.result_text.insert(tk.END, f"分析过程中出现错误：{str(e)}\n")
+            self._result_queue.put(f"分析过程中出现错误：{str(e)}\n")
 
 
 
@@ -1,8 +1,13 @@
+import mmap
+import os
 import re
 import sys
 from enum import Enum
 from collections import defaultdict
 
+# build_regex 中需要处理的片段：转义字符或正则元字符
+_RE_GRAMMAR_ESCAPE = re.compile(r'\\(.)|([+*?()\[\].])')
+
 
 class TokenType(Enum):
     KEYWORD = 1 # 关键字
@@ -17,11 +22,14 @@ class TokenType(Enum):
 class GrammarParser: # 语法解析器: 用于解析文法文件, 构建正则表达式
     def __init__(self, grammar_path):
         self.grammar = defaultdict(list)  # 默认值为list的字典，存储非终结符及其对应产生式
-        self.keywords = set() # 关键字集合，用于快速判断是否为关键字
+        self.keywords = frozenset() # 关键字集合，用于快速判断是否为关键字
         self.regex_rules = [] # list保存正则表达式规则
+        self.token_regex = None # 按本文法关键字生成的词法扫描正则
+        self.token_regex_bytes = None # 同上，字节版本
         self.load_grammar(grammar_path) # 加载文法文件
 
     def load_grammar(self, path): # 调用该方法加载文法文件，填充self.grammar和self.keywords
+        keywords = set(self.keywords)
         try:
             with open(path, 'r', encoding='utf-8') as f:
                 for line in f: # 逐行读取文法文件
@@ -33,7 +41,7 @@ class GrammarParser: # 语法解析器: 用于解析文法文件, 构建正则
                     rhs = [s.strip().strip("'") for s in rhs.split('|')] # 以|为分隔符分割右部产生式，去除首尾空白字符和单引号
 
                     if lhs == 'Keyword':
-                        self.keywords.update(rhs) # 如果左边是KeyWord，更新关键字集合
+                        keywords.update(rhs) # 如果左边是KeyWord，更新关键字集合
                     else:
                         pattern = self.build_regex(rhs) # 构建正则表达式
                         self.regex_rules.append((lhs, re.compile(pattern))) # 编译正则表达式并添加到规则列表
@@ -41,226 +49,154 @@ class GrammarParser: # 语法解析器: 用于解析文法文件, 构建正则
             print(f"文法文件 {path} 未找到")
             sys.exit(1)
 
+        # 加载完成后关键字不再变化，冻结并驻留，成员判断时相同的字符串可直接按地址比较
+        self.keywords = frozenset(sys.intern(k) for k in keywords)
+
+        self.token_regex = build_token_regex(self.keywords)
+        self.token_regex_bytes = build_token_regex(self.keywords, binary=True)
+
     def build_regex(self, expressions):
-        regex_parts = []
-        for expr in expressions:
-            parts = []
-            i = 0
-            while i < len(expr):
-                if expr[i] == '\\' and i + 1 < len(expr):  # 处理转义字符（如 \d）
-                    parts.append(re.escape(expr[i + 1]))  # 转义为 \\d
-                    i += 2
-                else:
-                    if expr[i] in ['+', '*', '?', '(', ')', '[', ']', '.']:
-                        parts.append(f'\\{expr[i]}')  # 转义正则元字符
-                    else:
-                        parts.append(expr[i])
-                    i += 1
-            regex_parts.append(''.join(parts))
+        # 每条表达式整体做一次替换，不再逐字符拼接
+        regex_parts = [_RE_GRAMMAR_ESCAPE.sub(self._escape_part, expr) for expr in expressions]
         return '^(' + '|'.join(regex_parts) + ')$'  # 拼接正则表达式
 
+    @staticmethod
+    def _escape_part(match):
+        if match.group(1) is not None:  # 处理转义字符（如 \d）
+            return re.escape(match.group(1))  # 转义为 \\d
+        return '\\' + match.group(2)  # 转义正则元字符
+
+
+# 主模式模板：finditer 一次扫描即可切分出全部单词，%s 处在加载文法时填入关键字
+# 换行、关键字、标识符、分隔符、运算符最常见且首字符与其余分组互不相交，放在最前面先尝试；
+# 数字相关分组之间按优先级排列，OTHER 必须放在最后
+_MASTER_TEMPLATE = r'''
+    [ \t\r]*                                                        # 单词前的空白在C层直接跳过，不单独产生匹配
+    (?:
+        (?P<NEWLINE>\n)                                             # 换行
+      | (?P<KEYWORD>(?:%s)(?!\w))                                   # 关键字
+      | (?P<IDENTIFIER>[A-Za-z_]\w*)                                # 标识符
+      | (?P<DELIMITER>[;,(){}\[\]])                                 # 分隔符
+      | (?P<OPERATOR>[-+*/=<>!&|])                                  # 运算符
+      | (?P<STRING>"[^"\\\r\n]*(?:\\[^\r\n][^"\\\r\n]*)*")          # 字符串，普通字符成段匹配，只在转义处进入外层循环
+      | (?P<BADSTRING>"[^"\\\r\n]*(?:\\[^\r\n][^"\\\r\n]*)*)        # 未闭合的字符串
+      | (?P<ZEROBAD>0[0-9]+)                                        # 首位为0的多位数字
+      | (?P<COMPLEX>[0-9]+(?:\.[0-9]+)?[+-][0-9]+(?:\.[0-9]+)?i)    # 复数
+      | (?P<SCIENTIFIC>[0-9]+(?:\.[0-9]+)?[eE][+-]?[0-9]+)          # 科学计数法
+      | (?P<FLOAT>[0-9]+\.[0-9]+(?![0-9eE]))                        # 浮点数，后跟e/E时是不完整的科学计数法
+      | (?P<BADNUMBER>[0-9]+(?:\.[0-9]*)?[eE][+-]?[0-9]*|[0-9]+\.)  # 不完整的数字
+      | (?P<INTEGER>[1-9][0-9]*|0)                                  # 整数
+      | (?P<BADIDENTIFIER>[^\W\d_]\w*)                              # 非ASCII字母开头的标识符
+      | (?P<SKIP>[ \t\r]+)                                          # 输入末尾的空白
+      | (?P<OTHER>.)                                                # 其他字符，忽略
+    )
+'''
+
+# 分组名到token类型的映射，None表示该分组不产生token
+_KIND_TYPES = {
+    'SKIP': None,
+    'NEWLINE': None,
+    'KEYWORD': TokenType.KEYWORD,
+    'IDENTIFIER': TokenType.IDENTIFIER,
+    'DELIMITER': TokenType.DELIMITER,
+    'OPERATOR': TokenType.OPERATOR,
+    'STRING': TokenType.CONSTANT,
+    'BADSTRING': TokenType.ERROR,
+    'ZEROBAD': TokenType.ERROR,
+    'COMPLEX': TokenType.CONSTANT,
+    'SCIENTIFIC': TokenType.CONSTANT,
+    'FLOAT': TokenType.CONSTANT,
+    'BADNUMBER': TokenType.ERROR,
+    'INTEGER': TokenType.CONSTANT,
+    'BADIDENTIFIER': TokenType.ERROR,
+    'OTHER': None,
+}
+
+
+# 含非ASCII字节或单独\r换行的文件不能按字节直接扫描，需要先解码
+_RE_NEEDS_DECODE = re.compile(rb'[\x80-\xff]|\r(?!\n)')
+
+
+def build_token_regex(keywords, binary=False): # 把关键字直接编进主模式，扫描时不必再逐个查关键字集合
+    # 长的关键字在前，保证同前缀时取最长；没有关键字时用永不匹配的(?!)占位
+    alternatives = '|'.join(re.escape(k) for k in sorted(keywords, key=lambda k: (-len(k), k)))
+    pattern = _MASTER_TEMPLATE % (alternatives or '(?!)')
+    if binary: # 字节版本，用于直接扫描内存映射的文件
+        pattern = pattern.encode('utf-8')
+    return re.compile(pattern, re.VERBOSE)
+
 
 class Lexer:
     def __init__(self, grammar_path):
         self.grammar = GrammarParser(grammar_path) # 解析文法文件
         self.line = 1 # 行号
-        self.pos = 0 # 位置指针
         self.tokens = []
 
-        # 构建DFA状态表
-        self.dfa_states = {
-            'START': self.handle_start, # 初始状态
-            'IDENTIFIER': self.handle_identifier, # 标识符状态
-            'NUMBER': self.handle_number, # 数字状态
-            'SCIENTIFIC': self.handle_scientific, # 科学计数法状态
-            'COMPLEX': self.handle_complex,# 复数状态
-            'STRING': self.handle_string, # 字符串状态
-        }
-
     def tokenize_file(self, source_path): # 读取源代码文件，返回词法分析结果
         try:
-            with open(source_path, 'r', encoding='utf-8') as f:
-                source = f.read()
-                return self.tokenize(source)
+            with open(source_path, 'rb') as f:
+                # 纯ASCII文件映射到内存后按字节扫描，省去整个文件的解码和复制；mmap不能映射空文件
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        if not _RE_NEEDS_DECODE.search(data):
+                            return self.tokenize_bytes(data)
+            self.tokens.extend(self.tokenize_stream(source_path))
+            return self.tokens
         except FileNotFoundError:
             print(f"源代码文件 {source_path} 未找到")
             return []
 
-    def tokenize(self, code):
-        self.current_state = 'START'
-        self.buffer = []
-        self.pos = 0
-        self.current_input = code  # Store the input for reference
-
-        while self.pos < len(code):
-            char = code[self.pos]
-            self.pos += 1
-
-            if char == '\n':
-                self.line += 1
-            handler = self.dfa_states.get(self.current_state, self.handle_unknown)
-            handler(char)
-
-        if self.buffer:
-            self.finalize_token()
+    def tokenize_stream(self, source_path, chunk_size=65536): # 逐块读取源代码文件，边读边产出token
+        with open(source_path, 'r', encoding='utf-8') as f:
+            rest = ''
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                text = rest + chunk
+                # 除换行外没有单词会跨行，因此只扫描到最后一个换行为止，剩余部分留给下一块
+                cut = text.rfind('\n') + 1
+                batch = []
+                self._scan(text[:cut], batch)
+                yield from batch
+                rest = text[cut:]
+            batch = []
+            self._scan(rest, batch)
+            yield from batch
 
+    def tokenize(self, code):
+        self._scan(code, self.tokens)
         return self.tokens
 
-    def handle_start(self, char):
-        if char.isalpha() or char == '_': # 标识符首字符
-            self.current_state = 'IDENTIFIER'
-            self.buffer.append(char)
-        elif char.isdigit(): # 数字首字符
-            self.current_state = 'NUMBER'
-            self.buffer.append(char)
-        elif char == '"':  # 检测到引号，进入字符串状态
-            self.current_state = 'STRING'
-            self.buffer.append(char)
-        elif char in {'+', '-', '*', '/', '=', '<', '>', '!', '&', '|'}: # 运算符
-            self.add_operator(char)
-        elif char in {';', ',', '(', ')', '{', '}', '[', ']'}: # 分隔符
-            self.add_delimiter(char)
-        elif char in {' ', '\t', '\r'}: # 空白字符
-            pass  # 忽略空白字符
-        # else:
-        #     self.add_error(char)
-
-    def handle_string(self, char):
-        """处理字符串状态"""
-        self.buffer.append(char)
-        if char == '"' and self.buffer[-2] != '\\':  # 检测到未转义的引号
-            self.finalize_token()
-            self.current_state = 'START'
-        elif char == '\n':  # 字符串中出现换行，视为错误
-            self.add_error(''.join(self.buffer))
-            self.buffer = []
-            self.current_state = 'START'
-    def handle_identifier(self, char):
-        if char.isalnum() or char == '_':
-            self.buffer.append(char)
-        else:
-            self.finalize_token()
-            self.pos -= 1  # 回退字符
-            self.current_state = 'START'
-
-
-    def handle_number(self, char):
-        buffer_str = ''.join(self.buffer)
-
-        # 处理首位为0的情况
-        if len(buffer_str) == 1 and buffer_str[0] == '0' and char.isdigit():
-            # 把0和后续数字作为一个错误token处理
-            self.buffer.append(char)
-            while self.pos < len(self.current_input) and self.current_input[self.pos].isdigit():
-                self.buffer.append(self.current_input[self.pos])
-                self.pos += 1
-            self.add_error(''.join(self.buffer))
-            self.buffer = []
-            self.current_state = 'START'
-            return
-
-        if char.isdigit():
-            self.buffer.append(char)
-        elif char == '.' and '.' not in buffer_str and 'e' not in buffer_str.lower():
-            self.buffer.append(char)
-        elif char.lower() == 'e' and 'e' not in buffer_str.lower():
-            self.buffer.append(char)
-            self.current_state = 'SCIENTIFIC'
-        elif char in {'+', '-'}:
-            if buffer_str[-1].lower() == 'e':
-                self.buffer.append(char)
-            else:
-                # 可能是复数的开始
-                self.buffer.append(char)
-                self.current_state = 'COMPLEX'
-        else:
-            self.finalize_token()
-            self.pos -= 1
-            self.current_state = 'START'
-
-    def handle_scientific(self, char):
-        if char.isdigit() or char in {'+', '-'}:
-            self.buffer.append(char)
-        else:
-            self.finalize_token()
-            self.pos -= 1
-            self.current_state = 'START'
-
-    def handle_complex(self, char):
-        buffer_str = ''.join(self.buffer)
-
-        if char.isdigit():
-            self.buffer.append(char)
-        elif char == '.' and not any(c == '.' for c in buffer_str.split('+')[-1].split('-')[-1]):
-            self.buffer.append(char)
-        elif char == 'i' and len(buffer_str) > 1:
-            self.buffer.append(char)
-            self.finalize_token()
-            self.current_state = 'START'
-        else:
-            # 如果不是复数的模式，回退并重新解析
-            value = buffer_str[:-1]  # 移除最后的 + 或 -
-            if value:
-                self.buffer = list(value)
-                self.finalize_token()
-            self.pos -= 2  # 回退两个字符
-            self.current_state = 'START'
-            self.buffer = []
-
-    def handle_unknown(self, char):
-        self.add_error(char)
-        self.current_state = 'START'
-    def finalize_token(self):
-        value = ''.join(self.buffer) # 合并字符缓冲区
-        token_type = self.determine_token_type(value) # 确定token类型
-        self.tokens.append(Token(self.line, token_type, value)) # 添加token
-        self.buffer = [] # 清空缓冲区
-
-
-    def determine_token_type(self, value):
-        # 关键字检查
-        if value in self.grammar.keywords:
-            return TokenType.KEYWORD
-
-        # 标识符检查
-        if re.match(r'^[a-zA-Z_]\w*$', value):
-            return TokenType.IDENTIFIER
-
-        # 科学计数法检查
-        scientific_pattern = r'^[+-]?(\d+\.\d+|\d+)[Ee][+-]?\d+$'
-        if re.match(scientific_pattern, value):
-            return TokenType.CONSTANT
-
-        # 复数检查
-        complex_pattern = r'^[+-]?(\d+\.\d+|\d+)[+-](\d+\.\d+|\d+)i$'
-        if re.match(complex_pattern, value):
-            return TokenType.CONSTANT
-
-        # 整数检查
-        if re.match(r'^([1-9]\d*|0)$', value):
-            return TokenType.CONSTANT
-
-        # 浮点数检查
-        if re.match(r'^[+-]?\d+\.\d+$', value):
-            return TokenType.CONSTANT
-
-        # 字符串检查
-        if re.match(r'^".*"$', value) or re.match(r"^'.*'$", value):
-            return TokenType.CONSTANT
-
-        return TokenType.ERROR
-
-    def add_operator(self, char): # 添加运算符
-        self.tokens.append(Token(self.line, TokenType.OPERATOR, char))
-
-    def add_delimiter(self, char): # 添加分隔符
-        self.tokens.append(Token(self.line, TokenType.DELIMITER, char))
-
-    def add_error(self, char): # 添加错误
-        self.tokens.append(Token(self.line, TokenType.ERROR, char))
+    def tokenize_bytes(self, data): # 扫描纯ASCII的字节数据，只对单词本身解码
+        line = self.line
+        tokens = self.tokens
+        for match in self.grammar.token_regex_bytes.finditer(data):
+            kind = match.lastgroup
+            token_type = _KIND_TYPES[kind]
+            if token_type is None:
+                if kind == 'NEWLINE':
+                    line += 1
+                continue
+
+            tokens.append(Token(line, token_type, match.group(kind).decode('ascii')))
+        self.line = line
+        return tokens
+
+    def _scan(self, code, tokens): # 扫描一段源代码，把token追加到tokens
+        line = self.line # 行号只在换行匹配时累加，扫描结束后写回
+        for match in self.grammar.token_regex.finditer(code):
+            kind = match.lastgroup
+            token_type = _KIND_TYPES[kind]
+            if token_type is None:
+                if kind == 'NEWLINE':
+                    line += 1
+                continue
+
+            tokens.append(Token(line, token_type, match.group(kind)))
+        self.line = line
 
 
 class Token:
+    __slots__ = ('line', 'type', 'value') # 每个单词一个对象，不需要__dict__
+
     def __init__(self, line, token_type, value):
         self.line = line # 行号
         self.type = token_type # token类型
@@ -284,6 +220,5 @@ if __name__ == "__main__":
 
     # 保存到文件
     output_file = "lexer_output.txt"
-    with open(output_file, "w", encoding="utf-8") as f:
-        for token in TOKENS:
-            f.write(f"({token.line}, {token.type}, '{token.value}')\n")
+    with open(output_file, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.writelines(f"({token.line}, {token.type}, '{token.value}')\n" for token in TOKENS)
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from collections import defaultdict
+from array import array
+from dataclasses import dataclass, field, fields
+from collections import defaultdict, deque
 from enum import Enum
 import sys
-from typing import List, Set, Dict, Tuple, FrozenSet
+from typing import Deque, Iterable, List, Optional, Sequence, Set, Dict, Tuple, FrozenSet, Union
 
 
 # Token type definition from lexer
@@ -17,37 +18,121 @@ class TokenType(Enum):
     ERROR = 6
 
 
+# Grammar symbols for token types that are matched by kind rather than by text
+TOKEN_SYMBOLS = {
+    TokenType.IDENTIFIER: "ID",  # No quotes for special tokens
+    TokenType.CONSTANT: "CONSTANT",
+}
+
+
+def with_slots(cls):
+    """Rebuild a dataclass with __slots__ for its fields
+
+    A stand-in for dataclass(slots=True), which needs Python 3.10. Instances
+    then have no per-object __dict__, which matters for the many items built
+    during state construction. Like the stdlib version, frozen classes get
+    __getstate__/__setstate__ so that copy and pickle still work.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = dict(cls.__dict__)
+    for name in names + ('__dict__', '__weakref__'):
+        namespace.pop(name, None)
+    namespace['__slots__'] = names
+    if cls.__dataclass_params__.frozen:
+        namespace['__getstate__'] = _slots_getstate
+        namespace['__setstate__'] = _slots_setstate
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def _slots_getstate(self):
+    return [getattr(self, f.name) for f in fields(self)]
+
+
+def _slots_setstate(self, state):
+    for f, value in zip(fields(self), state):
+        # The class is frozen, so bypass its __setattr__
+        object.__setattr__(self, f.name, value)
+
+
+# Grammar symbols are interned to small ints (see Grammar.symbol_id);
+# these two ids are fixed for every grammar
+EPSILON = 0
+END_SYMBOL = 1
+
+# Symbol sets such as FIRST are int bitmasks: bit k set means symbol id k is a member
+EPSILON_BIT = 1 << EPSILON
+
+
+def bits_to_symbols(mask: int) -> List[int]:
+    """Symbol ids present in a bitmask, in increasing order"""
+    symbols = []
+    while mask:
+        low = mask & -mask
+        symbols.append(low.bit_length() - 1)
+        mask ^= low
+    return symbols
+
+
+@with_slots
 @dataclass(frozen=True)
 class Production:
-    """Grammar production rule"""
-    left: str
-    right: tuple[str, ...]
+    """Grammar production rule over symbol ids"""
+    left: int
+    right: tuple[int, ...]
+    # Symbol names indexed by id, shared by the whole grammar; only used for display
+    names: Sequence[str] = field(repr=False, compare=False)
 
     def __str__(self):
-        return f"{self.left} → {' '.join(self.right)}"
+        names = self.names
+        return f"{names[self.left]} → {' '.join(names[symbol] for symbol in self.right)}"
 
 
+@with_slots
 @dataclass(frozen=True)
 class LR1Item:
-    """LR(1) item with dot position and lookahead"""
+    """LR(1) item with dot position and lookaheads
+
+    Items that differ only in their lookahead are kept as one item whose
+    lookaheads bitmask holds all of them.
+    """
     production: Production
     dot_position: int
-    lookahead: str
+    lookaheads: int  # Bitmask of lookahead symbol ids
+    # Derived from the fields above; computed once and excluded from eq/hash
+    next_symbol: int | None = field(init=False, repr=False, compare=False)
+    complete: bool = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        right = self.production.right
+        next_symbol = right[self.dot_position] if self.dot_position < len(right) else None
+        object.__setattr__(self, 'next_symbol', next_symbol)
+        object.__setattr__(self, 'complete', next_symbol is None)
+
+    def core_str(self) -> str:
+        """The item without its lookaheads"""
+        names = self.production.names
+        items = [names[symbol] for symbol in self.production.right]
+        items.insert(self.dot_position, "•")
+        return f"{names[self.production.left]} → {' '.join(items)}"
 
     def __str__(self):
-        items = list(self.production.right)
-        items.insert(self.dot_position, "•")
-        return f"{self.production.left} → {' '.join(items)}, {self.lookahead}"
+        names = self.production.names
+        return f"{self.core_str()}, {'/'.join(names[la] for la in bits_to_symbols(self.lookaheads))}"
 
-    def get_next_symbol(self) -> str | None:
+    def get_next_symbol(self) -> int | None:
         """Get the symbol after the dot"""
-        if self.dot_position < len(self.production.right):
-            return self.production.right[self.dot_position]
-        return None
+        return self.next_symbol
 
     def is_complete(self) -> bool:
         """Check if the item is complete (dot at end)"""
-        return self.dot_position >= len(self.production.right)
+        return self.complete
+
+
+# ACTION table entry: ('shift', state), ('reduce', production) or ('accept', None)
+Action = Tuple[str, Union[int, Production, None]]
+
+# Action kinds in the flat ACTION table used by LR1Parser.parse
+ERROR, SHIFT, REDUCE, ACCEPT = 0, 1, 2, 3
 
 
 class Grammar:
@@ -55,9 +140,14 @@ class Grammar:
 
     def __init__(self, grammar_file: str):
         self.productions: List[Production] = []
-        self.terminals: Set[str] = set()
-        self.non_terminals: Set[str] = set()
-        self.start_symbol: str = None
+        self.prods_by_lhs: Dict[int, List[Production]] = defaultdict(list)  # productions indexed by left side
+        self.terminals: Set[int] = set()
+        self.non_terminals: Set[int] = set()
+        self.start_symbol: int
+        # Symbol ids: ε, '$', then terminals and non-terminals, each in name order
+        self.symbol_name: List[str] = ['ε', '$']
+        self.symbol_id: Dict[str, int] = {'ε': EPSILON, '$': END_SYMBOL}
+        self.first_non_terminal: int = 2
         self._load_grammar(grammar_file)
 
     # def _load_grammar(self, filename: str):
@@ -102,6 +192,11 @@ class Grammar:
     #         sys.exit(1)
     def _load_grammar(self, filename: str):
         """Load grammar from file"""
+        terminals = set()
+        non_terminals = set()
+        start_symbol: Optional[str] = None
+        rules = []  # (left, right) pairs of symbol names
+        symbol_kinds: Dict[str, Tuple[Optional[str], bool]] = {}  # right-side part -> (symbol, is_terminal)
         try:
             with open(filename, 'r', encoding='utf-8') as f:
                 lines = [line.strip() for line in f if line.strip()]
@@ -109,252 +204,416 @@ class Grammar:
                 for line in lines:
                     left, right = line.split('→')
                     left = left.strip()
-                    self.non_terminals.add(left)
+                    non_terminals.add(left)
 
-                    if not self.start_symbol:
-                        self.start_symbol = left
+                    if not start_symbol:
+                        start_symbol = left
 
                     # Split alternatives on |
-                    alternatives = [alt.strip() for alt in right.split('|')]
-
-                    for alternative in alternatives:
+                    for alternative in right.split('|'):
                         symbols = []
-                        parts = alternative.strip().split()
-                        for part in parts:
-                            part = part.strip()
-                            if part == 'ε':
+                        for part in alternative.split():
+                            # The same parts recur throughout a grammar; classify each only once
+                            kind = symbol_kinds.get(part)
+                            if kind is None:
+                                kind = symbol_kinds[part] = self._classify_part(part)
+                            symbol, is_terminal = kind
+                            if symbol is None:  # ε
                                 continue
-                            if part in {'ID', 'CONSTANT'}:  # Special tokens without quotes
-                                symbol = part
-                                self.terminals.add(symbol)
-                            elif part.startswith("'") and part.endswith("'"):
-                                symbol = part
-                                self.terminals.add(symbol)
-                            elif part[0].isupper():
-                                symbol = part
-                                self.non_terminals.add(symbol)
+                            if is_terminal:
+                                terminals.add(symbol)
                             else:
-                                symbol = f"'{part}'"
-                                self.terminals.add(symbol)
+                                non_terminals.add(symbol)
                             symbols.append(symbol)
 
-                        if symbols:  # Only add non-empty productions
-                            self.productions.append(Production(left, tuple(symbols)))
-                        else:  # Handle ε-productions
-                            self.productions.append(Production(left, ()))
-
-                print("\n语法加载完成：")
-                print("终结符：", sorted(self.terminals))
-                print("非终结符：", sorted(self.non_terminals))
-                print("产生式：")
-                for prod in self.productions:
-                    print(f"  {prod}")
+                        # Empty symbols is an ε-production
+                        rules.append((left, tuple(symbols)))
 
         except FileNotFoundError:
             print(f"错误：找不到语法文件 {filename}")
             sys.exit(1)
 
+        if start_symbol is None:
+            raise ValueError(f"语法文件 {filename} 中没有产生式")
+        self._intern_symbols(terminals, non_terminals, start_symbol, rules)
+
+        print("\n语法加载完成：")
+        print("终结符：", sorted(terminals))
+        print("非终结符：", sorted(non_terminals))
+        print("产生式：")
+        for prod in self.productions:
+            print(f"  {prod}")
+
+    @staticmethod
+    def _classify_part(part: str) -> Tuple[Optional[str], bool]:
+        """Map a right-side part to (symbol, is_terminal); ε maps to (None, False)"""
+        if part == 'ε':
+            return None, False
+        if part in {'ID', 'CONSTANT'}:  # Special tokens without quotes
+            return part, True
+        if part.startswith("'") and part.endswith("'"):
+            return part, True
+        if part[0].isupper():
+            return part, False
+        return f"'{part}'", True  # Add quotes for unquoted terminals
+
+    def _intern_symbols(self, terminals: Set[str], non_terminals: Set[str],
+                        start_symbol: str, rules: List[Tuple[str, Tuple[str, ...]]]):
+        """Assign symbol ids and build the productions over them"""
+        for name in sorted(terminals):
+            self.symbol_id[name] = len(self.symbol_name)
+            self.symbol_name.append(name)
+        # Ids below this are ε, '$' and terminals; ids from it on are non-terminals
+        self.first_non_terminal = len(self.symbol_name)
+        for name in sorted(non_terminals):
+            self.symbol_id[name] = len(self.symbol_name)
+            self.symbol_name.append(name)
+        symbol_id = self.symbol_id
+
+        self.terminals = {symbol_id[name] for name in terminals}
+        self.non_terminals = {symbol_id[name] for name in non_terminals}
+        self.start_symbol = symbol_id[start_symbol]
+        for left, right in rules:
+            prod = Production(symbol_id[left], tuple(symbol_id[name] for name in right), self.symbol_name)
+            self.productions.append(prod)
+            self.prods_by_lhs[prod.left].append(prod)
+
 
 class LR1Parser:
     """LR(1) parser implementation"""
 
-    def __init__(self, grammar_file: str):
+    def __init__(self, grammar_file: str, lalr: bool = False, debug: bool = False, trace: bool = False):
         self.grammar = Grammar(grammar_file)
-        self.first_sets = self._compute_first_sets()
-        self.states, self.goto = self._build_states()
+        self.lalr: bool = lalr  # Merge states with the same core (LALR(1)) instead of canonical LR(1)
+        self.debug: bool = debug  # Print table construction details; file output is left to dump()
+        self.trace: bool = trace  # Record each parse step and write them to parse_steps.txt
+        self._item_pool: Dict[Tuple[Production, int, int], LR1Item] = {}  # (production, dot, lookaheads) -> item
+        self.first_sets: List[int] = self._compute_first_sets()
+        self._beta_first: Dict[Tuple[Production, int], Tuple[int, bool]] = self._compute_beta_firsts()
+        self.states: List[FrozenSet[LR1Item]]
+        self.goto: Dict[Tuple[int, int], int]
+        # predecessors[s] lists the (state, symbol) transitions that lead into state s
+        self.predecessors: List[List[Tuple[int, int]]]
+        self.states, self.goto, self.predecessors = self._build_states()
+        self.action_table: Dict[Tuple[int, int], Action]
+        self.goto_table: Dict[Tuple[int, int], int]
+        # Reduce-reduce conflicts as (state, lookahead, replaced, kept); the later reduce wins
+        self.conflicts: List[Tuple[int, int, Production, Production]] = []
         self.action_table, self.goto_table = self._build_parsing_tables()
+        self._flatten_tables()
 
-    def _compute_first_sets(self) -> Dict[str, Set[str]]:
-        """Compute FIRST sets for all symbols"""
-        first = {symbol: set() for symbol in
-                 self.grammar.terminals | self.grammar.non_terminals}
+    def _compute_first_sets(self) -> List[int]:
+        """Compute FIRST sets for all symbols, as bitmasks indexed by symbol id"""
+        first = [0] * len(self.grammar.symbol_name)
 
         # Initialize terminals
         for terminal in self.grammar.terminals:
-            first[terminal].add(terminal)
-
-        changed = True
-        while changed:
-            changed = False
-            for prod in self.grammar.productions:
-                left = prod.left
-                if not prod.right:  # ε-production
-                    if 'ε' not in first[left]:
-                        first[left].add('ε')
-                        changed = True
-                    continue
-
-                for symbol in prod.right:
-                    first_symbol = first[symbol]
-                    prev_size = len(first[left])
-                    first[left].update(x for x in first_symbol if x != 'ε')
-                    if len(first[left]) > prev_size:
-                        changed = True
-                    if 'ε' not in first_symbol:
-                        break
-                else:
-                    if 'ε' not in first[left]:
-                        first[left].add('ε')
-                        changed = True
+            first[terminal] = 1 << terminal
+
+        # Productions to revisit when FIRST of a non-terminal grows
+        dependents: Dict[int, List[Production]] = defaultdict(list)
+        for prod in self.grammar.productions:
+            for symbol in dict.fromkeys(prod.right):
+                if symbol in self.grammar.non_terminals:
+                    dependents[symbol].append(prod)
+
+        # Worklist of productions: each is re-evaluated only after FIRST of a
+        # symbol on its right side has changed
+        worklist: Deque[Production] = deque(self.grammar.productions)
+        queued: Set[Production] = set(worklist)
+        while worklist:
+            prod = worklist.popleft()
+            queued.discard(prod)
+
+            first_left = first[prod.left]
+            for symbol in prod.right:
+                first_symbol = first[symbol]
+                first_left |= first_symbol & ~EPSILON_BIT
+                if not first_symbol & EPSILON_BIT:
+                    break
+            else:  # ε-production, or every symbol can derive ε
+                first_left |= EPSILON_BIT
+
+            if first_left != first[prod.left]:
+                first[prod.left] = first_left
+                for dependent in dependents[prod.left]:
+                    if dependent not in queued:
+                        queued.add(dependent)
+                        worklist.append(dependent)
 
         return first
 
-    def _closure(self, items: Set[LR1Item]) -> FrozenSet[LR1Item]:
-        """Compute closure of LR(1) items"""
-        result = set(items)
-        while True:
-            new_items = set()
-            for item in result:
-                next_sym = item.get_next_symbol()
-                if next_sym in self.grammar.non_terminals:
-                    lookaheads = self._compute_lookaheads(item)
-                    for prod in self.grammar.productions:
-                        if prod.left == next_sym:
-                            for la in lookaheads:
-                                new_item = LR1Item(prod, 0, la)
-                                if new_item not in result:
-                                    new_items.add(new_item)
-            if not new_items:
-                break
-            result.update(new_items)
-        return frozenset(result)
-
-    def _compute_lookaheads(self, item: LR1Item) -> Set[str]:
-        """Compute lookahead symbols for an item"""
-        if item.dot_position >= len(item.production.right) - 1:
-            return {item.lookahead}
-
-        beta = item.production.right[item.dot_position + 1:]
-        first = set()
-        for symbol in beta:
-            first.update(self.first_sets[symbol])
-            if 'ε' not in self.first_sets[symbol]:
-                break
-        else:
-            first.add(item.lookahead)
-        return first - {'ε'}
+    def _make_item(self, production: Production, dot_position: int, lookaheads: int) -> LR1Item:
+        """Return the shared LR1Item instance for the given fields"""
+        key = (production, dot_position, lookaheads)
+        item = self._item_pool.get(key)
+        if item is None:
+            item = self._item_pool[key] = LR1Item(production, dot_position, lookaheads)
+        return item
 
-    def _goto(self, items: FrozenSet[LR1Item], symbol: str) -> FrozenSet[LR1Item]:
-        """Compute GOTO for a set of items and a symbol"""
-        next_items = set()
+    def _closure(self, items: Iterable[LR1Item]) -> FrozenSet[LR1Item]:
+        """Compute closure of LR(1) items"""
+        # Bind attributes and methods used in the inner loop to locals
+        non_terminals = self.grammar.non_terminals
+        prods_for = self.grammar.prods_by_lhs.get
+        beta_first = self._beta_first
+
+        # Lookaheads are accumulated per (production, dot) core; a core is
+        # expanded again only when its lookahead mask grows
+        masks: Dict[Tuple[Production, int], int] = {}
         for item in items:
-            if (next_sym := item.get_next_symbol()) == symbol:
-                next_items.add(LR1Item(
-                    item.production,
-                    item.dot_position + 1,
-                    item.lookahead
-                ))
-        return self._closure(next_items)
-
-    def _build_states(self) -> Tuple[List[FrozenSet[LR1Item]], Dict]:
-        """Build LR(1) states and goto function"""
-        states = []
-        goto = {}
+            core = (item.production, item.dot_position)
+            masks[core] = masks.get(core, 0) | item.lookaheads
+        worklist: Deque[Tuple[Production, int]] = deque(masks)
+        queued = set(masks)
+        pop_core = worklist.popleft
+        push_core = worklist.append
+        while worklist:
+            core = pop_core()
+            queued.discard(core)
+            prod, dot_position = core
+            if dot_position < len(prod.right) and (next_sym := prod.right[dot_position]) in non_terminals:
+                first, nullable = beta_first[core]
+                lookaheads = first | masks[core] if nullable else first
+                for next_prod in prods_for(next_sym, ()):
+                    new_core = (next_prod, 0)
+                    old_mask = masks.get(new_core, 0)
+                    if lookaheads & ~old_mask:
+                        masks[new_core] = old_mask | lookaheads
+                        if new_core not in queued:
+                            queued.add(new_core)
+                            push_core(new_core)
+
+        make_item = self._make_item
+        return frozenset(make_item(prod, dot_position, mask) for (prod, dot_position), mask in masks.items())
+
+    def _compute_beta_firsts(self) -> Dict[Tuple[Production, int], Tuple[int, bool]]:
+        """FIRST of the symbols after the dot's next symbol, per (production, dot_position)
+
+        Maps to (mask without ε, whether that suffix can derive ε); it does not
+        depend on the item's state or lookahead, so it is computed once here.
+        """
+        first_sets = self.first_sets
+        beta_first = {}
+        for prod in self.grammar.productions:
+            right = prod.right
+            first, nullable = 0, True  # FIRST of the empty suffix
+            for dot_position in range(len(right) - 1, -1, -1):
+                beta_first[prod, dot_position] = (first, nullable)
+                first_symbol = first_sets[right[dot_position]]
+                if first_symbol & EPSILON_BIT:
+                    first |= first_symbol & ~EPSILON_BIT
+                else:
+                    first, nullable = first_symbol, False
+        return beta_first
+
+    def _state_core(self, state: FrozenSet[LR1Item]) -> FrozenSet[Tuple[Production, int]]:
+        """Items of a state without their lookaheads"""
+        return frozenset((item.production, item.dot_position) for item in state)
+
+    def _merge_lookaheads(self, state: FrozenSet[LR1Item], other: FrozenSet[LR1Item]) -> FrozenSet[LR1Item]:
+        """Union two states with the same core, item by item"""
+        masks = {(item.production, item.dot_position): item.lookaheads for item in state}
+        for item in other:
+            core = (item.production, item.dot_position)
+            masks[core] |= item.lookaheads
+        return frozenset(self._make_item(prod, dot_position, mask) for (prod, dot_position), mask in masks.items())
+
+    def _build_states(self) -> Tuple[List[FrozenSet[LR1Item]], Dict[Tuple[int, int], int],
+                                     List[List[Tuple[int, int]]]]:
+        """Build LR(1) states, goto function and its inverse (LALR(1) states if self.lalr)"""
+        goto: Dict[Tuple[int, int], int] = {}
 
         # Create initial state with augmented grammar
-        start_prod = [p for p in self.grammar.productions if p.left == self.grammar.start_symbol][0]
-        initial_item = LR1Item(start_prod, 0, '$')
+        start_prod = self.grammar.prods_by_lhs[self.grammar.start_symbol][0]
+        initial_item = self._make_item(start_prod, 0, 1 << END_SYMBOL)
         initial_state = self._closure({initial_item})
 
-        states.append(initial_state)
-        state_map = {initial_state: 0}
-
-        # Process states until no new states are found
-        index = 0
-        while index < len(states):
+        states: List[FrozenSet[LR1Item]] = [initial_state]
+        predecessors: List[List[Tuple[int, int]]] = [[]]
+        # LALR keys states by core, so states differing only in lookaheads are merged
+        state_map: Dict[FrozenSet, int] = {self._state_core(initial_state) if self.lalr else initial_state: 0}
+
+        # Process states until no new states are found; in LALR mode a merged
+        # state is queued again so its new lookaheads reach its successors
+        worklist: Deque[int] = deque([0])
+        queued: Set[int] = {0}
+        while worklist:
+            index = worklist.popleft()
+            queued.discard(index)
             state = states[index]
 
-            # Get all symbols that appear after dots
-            symbols = set()
+            # Partition the advanced items by the symbol after the dot in one
+            # pass; each partition is the kernel of GOTO(state, symbol)
+            kernels: Dict[int, Set[LR1Item]] = defaultdict(set)
             for item in state:
-                if (symbol := item.get_next_symbol()):
-                    symbols.add(symbol)
-
-            # Sort symbols for deterministic processing
-            for symbol in sorted(symbols):
-                next_state = self._goto(state, symbol)
-                if not next_state:
-                    continue
-
-                # Check if this state already exists
-                if next_state in state_map:
-                    goto[index, symbol] = state_map[next_state]
-                else:
+                if (symbol := item.next_symbol) is not None:
+                    kernels[symbol].add(self._make_item(item.production, item.dot_position + 1, item.lookaheads))
+
+            # Symbols and items hash as ints, so this order is already the same on every run
+            for symbol, kernel in kernels.items():
+                next_state = self._closure(kernel)
+
+                key = self._state_core(next_state) if self.lalr else next_state
+                target = state_map.get(key)
+                if target is None:
+                    target = len(states)
                     states.append(next_state)
-                    state_map[next_state] = len(states) - 1
-                    goto[index, symbol] = len(states) - 1
+                    predecessors.append([])
+                    state_map[key] = target
+                    grew = True
+                elif next_state == states[target]:
+                    grew = False
+                else:  # Same core (LALR): merge in any new lookaheads
+                    merged = self._merge_lookaheads(states[target], next_state)
+                    grew = merged != states[target]
+                    states[target] = merged
+
+                # A merged LALR state is processed again; record each edge once
+                if (index, symbol) not in goto:
+                    goto[index, symbol] = target
+                    predecessors[target].append((index, symbol))
+                if grew and target not in queued:
+                    queued.add(target)
+                    worklist.append(target)
+
+        return states, goto, predecessors
+
+    def _build_parsing_tables(self) -> Tuple[Dict[Tuple[int, int], Action], Dict[Tuple[int, int], int]]:
+        """Build ACTION and GOTO tables"""
+        action: Dict[Tuple[int, int], Action] = {}
+        goto_table: Dict[Tuple[int, int], int] = {}
+        names = self.grammar.symbol_name
+        debug = self.debug
+
+        if debug:
+            print("\n开始构建语法分析表...")
+
+        # First handle shifts and gotos
+        terminals = self.grammar.terminals
+        for (i, symbol), next_state in self.goto.items():
+            if symbol in terminals:
+                action[i, symbol] = ('shift', next_state)
+            else:
+                goto_table[i, symbol] = next_state
+
+        # Then handle reduces and accept
+        for i, state in enumerate(self.states):
+            for item in state:
+                if item.complete:
+                    if item.production.left == self.grammar.start_symbol:
+                        action[i, END_SYMBOL] = ('accept', None)
+                        if debug:
+                            print(f"  Adding accept action: ({i}, $)")
+                    else:
+                        for lookahead in bits_to_symbols(item.lookaheads):
+                            # Check for shift-reduce conflicts
+                            if (i, lookahead) in action:
+                                existing = action[i, lookahead]
+                                if existing[0] == 'shift':
+                                    # Prefer shift over reduce (shift-reduce conflict resolution)
+                                    if debug:
+                                        print(f"  Shift-reduce conflict at state {i} for {names[lookahead]}")
+                                        print(f"    Existing: {existing}")
+                                        print(f"    New: reduce {item.production}")
+                                        print(f"    Choosing shift")
+                                    continue
+                                if isinstance(existing[1], Production) and existing[1] != item.production:
+                                    # Can appear after LALR merging even if the grammar is LR(1);
+                                    # reported regardless of debug since the parser may reject valid input
+                                    self.conflicts.append((i, lookahead, existing[1], item.production))
+                                    print(f"  Reduce-reduce conflict at state {i} for {names[lookahead]}")
+                                    print(f"    Existing: reduce {existing[1]}")
+                                    print(f"    New: reduce {item.production}")
+                            action[i, lookahead] = ('reduce', item.production)
+                            if debug:
+                                print(f"  Adding reduce action: ({i}, {names[lookahead]}) -> reduce {item.production}")
+
+        return action, goto_table
 
-            index += 1
+    def dump(self):
+        """Write the states and tables to states.txt, parsing_process.txt and parsing_tables.txt"""
+        names = self.grammar.symbol_name
 
-        print("\n状态集构建完成：")
         states_output = []
-        for i, state in enumerate(states):
+        for i, state in enumerate(self.states):
             states_output.append(f"\n状态 {i}:")
             for item in state:
-                states_output.append(f"  {item}")
+                # One line per lookahead, as in the canonical LR(1) item listing
+                core = item.core_str()
+                for lookahead in bits_to_symbols(item.lookaheads):
+                    states_output.append(f"  {core}, {names[lookahead]}")
 
         states_content = "\n".join(states_output)
         save_to_file(states_content, 'states.txt')
-        print(states_content)
+        if self.debug:
+            print("\n状态集构建完成：")
+            print(states_content)
 
-        return states, goto
+        transitions = defaultdict(list)
+        for (i, symbol), next_state in sorted(self.goto.items()):
+            transitions[i].append((symbol, next_state))
 
-    def _build_parsing_tables(self) -> Tuple[Dict, Dict]:
-        """Build ACTION and GOTO tables"""
-        action = {}
-        goto_table = {}
-
-        print("\n开始构建语法分析表...")
         parsing_output = []
-        for i, state in enumerate(self.states):
+        for i in range(len(self.states)):
             parsing_output.append(f"\n状态 {i}:")
-
-            # First handle shifts and gotos
-            for symbol in self.grammar.terminals | self.grammar.non_terminals:
-                if (i, symbol) in self.goto:
-                    next_state = self.goto[i, symbol]
-                    if symbol in self.grammar.terminals:
-                        action[i, symbol] = ('shift', next_state)
-                        parsing_output.append(f"  Adding shift action：({i}, {symbol}) -> 移进到状态 {next_state}")
-                    else:
-                        goto_table[i, symbol] = next_state
-                        parsing_output.append(f"  Adding goto action：({i}, {symbol}) -> goto {next_state}")
-
-            # Then handle reduces and accept
-            for item in state:
-                if item.is_complete():
-                    if item.production.left == self.grammar.start_symbol:
-                        action[i, '$'] = ('accept', None)
-                        print(f"  Adding accept action: ({i}, $)")
-                    else:
-                        # Check for shift-reduce conflicts
-                        if (i, item.lookahead) in action:
-                            existing = action[i, item.lookahead]
-                            if existing[0] == 'shift':
-                                # Prefer shift over reduce (shift-reduce conflict resolution)
-                                print(f"  Shift-reduce conflict at state {i} for {item.lookahead}")
-                                print(f"    Existing: {existing}")
-                                print(f"    New: reduce {item.production}")
-                                print(f"    Choosing shift")
-                                continue
-                        action[i, item.lookahead] = ('reduce', item.production)
-                        print(f"  Adding reduce action: ({i}, {item.lookahead}) -> reduce {item.production}")
+            for symbol, next_state in transitions[i]:
+                if symbol in self.grammar.terminals:
+                    parsing_output.append(f"  Adding shift action：({i}, {names[symbol]}) -> 移进到状态 {next_state}")
+                else:
+                    parsing_output.append(f"  Adding goto action：({i}, {names[symbol]}) -> goto {next_state}")
 
         tables_output = ["ACTION："]
-        for (state, symbol), (action_type, value) in sorted(action.items()):
+        for (state, symbol), (action_type, value) in sorted(self.action_table.items()):
             action_str = "接受" if action_type == "accept" else \
                 f"移进到状态{value}" if action_type == "shift" else \
                     f"按{value}规约"
-            tables_output.append(f"  ({state}, {symbol}) -> {action_str}")
+            tables_output.append(f"  ({state}, {names[symbol]}) -> {action_str}")
 
         tables_output.append("\nGOTO表：")
-        for (state, symbol), next_state in sorted(goto_table.items()):
-            tables_output.append(f"  ({state}, {symbol}) -> {next_state}")
+        for (state, symbol), next_state in sorted(self.goto_table.items()):
+            tables_output.append(f"  ({state}, {names[symbol]}) -> {next_state}")
 
         save_to_file("\n".join(parsing_output), 'parsing_process.txt')
         save_to_file("\n".join(tables_output), 'parsing_tables.txt')
 
-        return action, goto_table
+    def _flatten_tables(self):
+        """Copy ACTION and GOTO into flat arrays indexed by state * width + column
+
+        ACTION columns are terminal ids (including '$'); each cell holds a kind
+        (ERROR, SHIFT, REDUCE, ACCEPT) and an argument (target state or
+        production index). GOTO columns are non-terminal ids minus
+        first_non_terminal; empty cells hold -1.
+
+        A reduce only consults GOTO in a state that has a GOTO entry for the
+        reduced non-terminal, so only those states get a GOTO row; goto_row
+        maps a state to its row (-1 if it has none).
+        """
+        n_states = len(self.states)
+        self.action_width = width = self.grammar.first_non_terminal
+        self.goto_width = len(self.grammar.symbol_name) - width
+        self.action_kind = array('b', bytes(n_states * width))
+        self.action_arg = array('i', [0]) * (n_states * width)
+
+        goto_states = sorted({state for state, _ in self.goto_table})
+        self.goto_row = array('i', [-1]) * n_states
+        for row, state in enumerate(goto_states):
+            self.goto_row[state] = row
+        self.goto_states = array('i', [-1]) * (len(goto_states) * self.goto_width)
+
+        prod_index = {prod: i for i, prod in enumerate(self.grammar.productions)}
+        for (state, symbol), (action_type, value) in self.action_table.items():
+            index = state * width + symbol
+            if action_type == 'shift':
+                self.action_kind[index] = SHIFT
+                self.action_arg[index] = value
+            elif action_type == 'reduce':
+                self.action_kind[index] = REDUCE
+                self.action_arg[index] = prod_index[value]
+            else:
+                self.action_kind[index] = ACCEPT
+        for (state, symbol), next_state in self.goto_table.items():
+            self.goto_states[self.goto_row[state] * self.goto_width + symbol - width] = next_state
 
     # def _build_parsing_tables(self) -> Tuple[Dict, Dict]:
     #     """Build ACTION and GOTO tables"""
@@ -397,72 +656,91 @@ class LR1Parser:
 
     def parse(self, tokens: List[Tuple[int, TokenType, str]]) -> Tuple[bool, List[str]]:
         """Parse input tokens and return success status and errors"""
-        stack = [(0, '$')]  # (state, symbol) pairs
+        names = self.grammar.symbol_name
+        productions = self.grammar.productions
+        width, goto_width = self.action_width, self.goto_width
+        first_non_terminal = self.grammar.first_non_terminal
+        action_kind, action_arg = self.action_kind, self.action_arg
+        goto_row, goto_states = self.goto_row, self.goto_states
+
+        # Parse stack as two parallel int arrays: states and the symbols that led to them
+        state_stack = array('i', [0])
+        symbol_stack = array('i', [END_SYMBOL])
         input_tokens = self._convert_tokens(tokens) + ['$']
+        # Tokens that are not terminals of the grammar map to the ε column, which has no actions
+        input_ids = []
+        for token in input_tokens:
+            symbol = self.grammar.symbol_id.get(token, EPSILON)
+            input_ids.append(symbol if symbol < width else EPSILON)
         errors = []
         pos = 0
 
         print("\n开始语法分析...")
         print(f"输入 token: {input_tokens}")
 
+        trace = self.trace
         parse_steps = []
+        success = False
         while True:
-            state = stack[-1][0]
+            state = state_stack[-1]
             current_token = input_tokens[pos]
+            current_id = input_ids[pos]
 
-            parse_steps.append(f"\n当前状态：{state}")
-            parse_steps.append(f"当前记号：{current_token}")
-            parse_steps.append(f"栈内容：{stack}")
-            parse_steps.append(f"剩余输入：{input_tokens[pos:]}")
+            if trace:
+                parse_steps.append(f"\n当前状态：{state}")
+                parse_steps.append(f"当前记号：{current_token}")
+                parse_steps.append(f"栈内容：{[(s, names[symbol]) for s, symbol in zip(state_stack, symbol_stack)]}")
+                parse_steps.append(f"剩余输入：{input_tokens[pos:]}")
 
-            if (state, current_token) not in self.action_table:
+            index = state * width + current_id
+            kind = action_kind[index]
+            if kind == ERROR:
                 print(f"\nError: No action found for state {state} and token {current_token}")
                 print("Available actions for state {state}:")
                 for (s, t), (action_type, value) in self.action_table.items():
                     if s == state:
-                        print(f"  Token: {t}, Action: ({action_type}, {value})")
+                        print(f"  Token: {names[t]}, Action: ({action_type}, {value})")
                 line_no = tokens[pos][0] if pos < len(tokens) else tokens[-1][0]
                 errors.append(f"Line {line_no}: Syntax error, unexpected token '{current_token}'")
-                return False, errors
-
-            action, value = self.action_table[state, current_token]
-            print(f"Action: {action}, Value: {value}")
+                break
 
-            if action == 'shift':
-                stack.append((value, current_token))
+            if kind == SHIFT:
+                next_state = action_arg[index]
+                print(f"Action: shift, Value: {next_state}")
+                state_stack.append(next_state)
+                symbol_stack.append(current_id)
                 pos += 1
-            elif action == 'reduce':
-                for _ in range(len(value.right)):
-                    stack.pop()
-                prev_state = stack[-1][0]
-                goto_state = self.goto_table[prev_state, value.left]
-                stack.append((goto_state, value.left))
+            elif kind == REDUCE:
+                value = productions[action_arg[index]]
+                print(f"Action: reduce, Value: {value}")
+                if value.right:  # del a[-0:] would clear the whole array
+                    del state_stack[-len(value.right):]
+                    del symbol_stack[-len(value.right):]
+                prev_state = state_stack[-1]
+                goto_state = goto_states[goto_row[prev_state] * goto_width + value.left - first_non_terminal]
+                state_stack.append(goto_state)
+                symbol_stack.append(value.left)
                 print(f"Reduced by {value}, goto state {goto_state}")
-            elif action == 'accept':
+            elif kind == ACCEPT:
+                print("Action: accept, Value: None")
                 print("\nInput accepted!")
-                return True, errors
+                success = True
+                break
             else:
                 line_no = tokens[pos][0]
                 errors.append(f"Line {line_no}: Invalid action in parser")
-                return False, errors
+                break
+
+        # Written once at the end instead of after every step
+        if trace:
             save_to_file("\n".join(parse_steps), 'parse_steps.txt')
+        return success, errors
+
     def _convert_tokens(self, tokens: List[Tuple[int, TokenType, str]]) -> List[str]:
         """Convert lexer tokens to parser symbols"""
-        converted = []
-        for _, type_, value in tokens:
-            if type_ == TokenType.KEYWORD:
-                converted.append(f"'{value}'")
-            elif type_ == TokenType.IDENTIFIER:
-                converted.append("ID")  # No quotes for special tokens
-            elif type_ == TokenType.CONSTANT:
-                converted.append("CONSTANT")  # No quotes for special tokens
-            elif type_ == TokenType.DELIMITER:
-                converted.append(f"'{value}'")
-            elif type_ == TokenType.OPERATOR:
-                converted.append(f"'{value}'")
-            else:
-                converted.append(f"'{value}'")
-        return converted
+        # Identifiers and constants map to fixed symbols; every other token is its quoted text
+        fixed = TOKEN_SYMBOLS.get
+        return [fixed(type_) or f"'{value}'" for _, type_, value in tokens]
 
 def save_to_file(content: str, filename: str):
     """Save content to file with UTF-8 encoding"""
@@ -498,7 +776,8 @@ def main():
         return
 
     # Create and run parser
-    parser = LR1Parser('grammar2.txt')
+    parser = LR1Parser('grammar2.txt', debug=True, trace=True)
+    parser.dump()
     success, errors = parser.parse(tokens)
 
     # Output results
@@ -510,8 +789,7 @@ def main():
 
         with open('syntax_errors.txt', 'w', encoding='utf-8') as f:
             f.write("编译错误:\n\n")
-            for error in errors:
-                f.write(error + '\n')
+            f.writelines(error + '\n' for error in errors)
 
 
 